@@ -1,30 +1,39 @@
 from __future__ import annotations
 
-import json
+import hashlib
+import hmac
+import mmap
 import os
+import queue
 import re
 import shlex
 import shutil
 import subprocess
 import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone
-from fnmatch import fnmatch
-from functools import lru_cache
+from fnmatch import fnmatch, translate
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Any, Literal
+from typing import Any, Iterator, Literal
 from uuid import UUID, uuid4
 
+import orjson
 from fastapi import Depends, FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, ValidationError
 
 APP_VERSION = "0.1.0-mvp"
 ROUTER_CONFIDENCE_THRESHOLD = 0.70
 SHELL_CONFIDENCE_THRESHOLD = 0.80
 DEFAULT_SHELL_TIMEOUT_MS = 10_000
 DEFAULT_SHELL_MAX_OUTPUT_CHARS = 20_000
+APPROVAL_TOKEN_CAP = 1_000
+STORED_PLAN_CAP = 10_000
 API_TOKEN = os.environ.get("LITECLAW_AUTH_TOKEN") or os.environ.get(
     "LITECLAW_API_TOKEN", uuid4().hex
 )
@@ -36,7 +45,19 @@ def now_utc() -> datetime:
 
 
 def iso(dt: datetime) -> str:
-    return dt.replace(microsecond=0).isoformat().replace("+00:00", "Z")
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+_iso_now_cache: tuple[int, str] = (0, "")
+
+
+def iso_now() -> str:
+    """iso_now() cached at one-second granularity for hot logging paths."""
+    global _iso_now_cache
+    second = int(time.time())
+    if _iso_now_cache[0] != second:
+        _iso_now_cache = (second, iso(now_utc()))
+    return _iso_now_cache[1]
 
 
 class PermissionScope(BaseModel):
@@ -57,6 +78,8 @@ class Step(BaseModel):
 
 
 class Plan(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     plan_id: UUID
     created_at: str
     user_intent_summary: str
@@ -89,12 +112,15 @@ class ApprovalToken(BaseModel):
     plan_id: UUID
     issued_at: str
     expires_at: str
+    expires_at_ms: int | None = None
     ttl_seconds: int = 300
     one_time_use: bool = True
     consumed_at: str | None = None
 
 
 class TaskEvent(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     timestamp: str
     level: Literal["debug", "info", "warn", "error"]
     step_id: str | None = None
@@ -107,6 +133,7 @@ class TaskTrace(BaseModel):
     plan_id: UUID
     status: Literal["queued", "running", "completed", "failed", "denied", "timeout"]
     started_at: str
+    started_at_ms: int | None = None
     ended_at: str | None = None
     agent: Literal["conversation", "file", "shell", "browser"] | None = None
     events: list[TaskEvent]
@@ -118,6 +145,7 @@ class TaskSummary(BaseModel):
     plan_id: UUID
     status: Literal["queued", "running", "completed", "failed", "denied", "timeout"]
     started_at: str
+    started_at_ms: int | None = None
     ended_at: str | None = None
     agent: Literal["conversation", "file", "shell", "browser"] | None = None
 
@@ -147,7 +175,9 @@ class DoctorReport(BaseModel):
 
 
 class ExecuteTaskRequest(BaseModel):
-    plan: Plan
+    # Raw mapping, not Plan: execution validates lazily so that a payload
+    # matching an already-registered plan skips re-parsing the nested model.
+    plan: dict[str, Any]
     approval_token_id: UUID | None = None
 
 
@@ -156,9 +186,15 @@ class ShellConfig(BaseModel):
 
 
 class AppConfig(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     allowed_folders: list[str] = Field(default_factory=list)
     shell: ShellConfig = Field(default_factory=ShellConfig)
     history_enabled: bool = True
+    # 0 means pick automatically from the CPU count.
+    search_workers: int = 0
+    # Opt-in: spill very large searches onto worker processes.
+    search_processes: bool = False
 
 
 class ModelEntry(BaseModel):
@@ -228,10 +264,32 @@ class ActionCard(BaseModel):
     approve_token_request: ActionCardApproveTokenRequest
 
 
+TASK_INDEX_ADAPTER = TypeAdapter(list[TaskSummary])
+PLAN_ADAPTER = TypeAdapter(Plan)
+TRACE_ADAPTER = TypeAdapter(TaskTrace)
+
 approval_tokens: dict[UUID, ApprovalToken] = {}
-stored_plans: dict[UUID, Plan] = {}
+
+
+class BoundedPlanStore(OrderedDict):
+    """Plan store capped at ``STORED_PLAN_CAP`` entries.
+
+    Inserts evict the least recently used plan (and its cached digest)
+    once the cap is reached, so the store stays bounded even when
+    clients register plans they never execute.
+    """
+
+    def __setitem__(self, plan_id: UUID, plan: Plan) -> None:
+        super().__setitem__(plan_id, plan)
+        self.move_to_end(plan_id)
+        while len(self) > STORED_PLAN_CAP:
+            evicted, _ = self.popitem(last=False)
+            _plan_digests.pop(evicted, None)
+
+
+stored_plans: BoundedPlanStore = BoundedPlanStore()
+_plan_digests: dict[UUID, bytes] = {}
 approval_lock = threading.Lock()
-config_lock = threading.Lock()
 current_config = AppConfig()
 models_lock = threading.Lock()
 current_models = ModelsState()
@@ -244,9 +302,17 @@ async def lifespan(_: FastAPI):
     ensure_task_store()
     backend_log_path().parent.mkdir(parents=True, exist_ok=True)
     yield
+    shutdown_search_pool()
+    flush_task_index()
+    flush_backend_log()
 
 
-app = FastAPI(title="LiteClaw Backend", version=APP_VERSION, lifespan=lifespan)
+app = FastAPI(
+    title="LiteClaw Backend",
+    version=APP_VERSION,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -256,11 +322,28 @@ app.add_middleware(
 )
 
 
+def model_response(model: BaseModel) -> ORJSONResponse:
+    return ORJSONResponse(model.model_dump(mode="json"))
+
+
+@lru_cache(maxsize=4)
+def expected_authorization(token: str) -> bytes:
+    return f"Bearer {token}".encode()
+
+
+@lru_cache(maxsize=2048)
+def verify_authorization(header: str, expected: bytes) -> bool:
+    """Constant-time header check, memoised per exact header value.
+
+    Repeat requests from the same client become a dict hit; the expected
+    value is part of the key so a runtime token change simply misses."""
+    return hmac.compare_digest(header.encode(), expected)
+
+
 def require_bearer(authorization: str | None = Header(default=None)) -> None:
     if not authorization:
         raise HTTPException(status_code=401, detail="Missing authorization header")
-    scheme, _, token = authorization.partition(" ")
-    if scheme.lower() != "bearer" or token != API_TOKEN:
+    if not verify_authorization(authorization, expected_authorization(API_TOKEN)):
         raise HTTPException(status_code=401, detail="Invalid bearer token")
 
 
@@ -291,7 +374,7 @@ def write_default_config_if_missing() -> None:
         return
     default = AppConfig().model_dump()
     temp_path = path.with_suffix(".tmp")
-    temp_path.write_text(json.dumps(default, indent=2), encoding="utf-8")
+    temp_path.write_bytes(orjson.dumps(default, option=orjson.OPT_INDENT_2))
     temp_path.replace(path)
 
 
@@ -303,25 +386,79 @@ def ensure_task_store() -> None:
         index.write_text("[]", encoding="utf-8")
 
 
-def load_task_index() -> list[TaskSummary]:
+TASK_INDEX_FLUSH_DELAY_S = 0.05
+
+_task_index: dict[UUID, TaskSummary] = {}
+_task_index_lock = threading.Lock()
+_task_index_loaded_for: Path | None = None
+_task_index_dirty = False
+_task_index_timer: threading.Timer | None = None
+
+
+def _seed_task_index() -> None:
+    """Load the on-disk index into memory once per index path. Caller holds
+    _task_index_lock."""
+    global _task_index, _task_index_loaded_for
+    path = task_index_path()
+    if _task_index_loaded_for == path:
+        return
+    _flush_task_index_locked()
     ensure_task_store()
     try:
-        payload = json.loads(task_index_path().read_text(encoding="utf-8"))
-    except json.JSONDecodeError as exc:
+        entries = TASK_INDEX_ADAPTER.validate_json(path.read_bytes())
+    except ValidationError as exc:
         raise HTTPException(
             status_code=500, detail=f"Invalid task index JSON: {exc}"
         ) from exc
-    return [TaskSummary(**item) for item in payload]
+    _task_index = {entry.task_id: entry for entry in entries}
+    _task_index_loaded_for = path
+
 
+def summary_started_ms(item: TaskSummary) -> int:
+    if item.started_at_ms is not None:
+        return item.started_at_ms
+    started = datetime.fromisoformat(item.started_at.replace("Z", "+00:00"))
+    return int(started.timestamp() * 1000)
 
-def write_task_index(entries: list[TaskSummary]) -> None:
+
+def load_task_index() -> list[TaskSummary]:
+    with _task_index_lock:
+        _seed_task_index()
+        entries = list(_task_index.values())
+    entries.sort(key=summary_started_ms, reverse=True)
+    return entries
+
+
+def write_task_index(entries: list[TaskSummary], path: Path | None = None) -> None:
     ensure_task_store()
-    temp = task_index_path().with_suffix(".tmp")
-    temp.write_text(
-        json.dumps([entry.model_dump(mode="json") for entry in entries], indent=2),
-        encoding="utf-8",
+    target = path if path is not None else task_index_path()
+    temp = target.with_suffix(".tmp")
+    temp.write_bytes(
+        orjson.dumps(
+            [entry.model_dump(mode="json") for entry in entries],
+            option=orjson.OPT_INDENT_2,
+        )
     )
-    temp.replace(task_index_path())
+    temp.replace(target)
+
+
+def _flush_task_index_locked() -> None:
+    """Write the in-memory index to disk if it has pending changes. Caller
+    holds _task_index_lock."""
+    global _task_index_dirty, _task_index_timer
+    if _task_index_timer is not None:
+        _task_index_timer.cancel()
+        _task_index_timer = None
+    if not _task_index_dirty:
+        return
+    _task_index_dirty = False
+    entries = sorted(_task_index.values(), key=summary_started_ms, reverse=True)
+    write_task_index(entries, path=_task_index_loaded_for)
+
+
+def flush_task_index() -> None:
+    with _task_index_lock:
+        _flush_task_index_locked()
 
 
 def task_trace_path(task_id: UUID) -> Path:
@@ -332,22 +469,31 @@ def persist_task_trace(trace: TaskTrace) -> None:
     ensure_task_store()
     trace_file = task_trace_path(trace.task_id)
     temp = trace_file.with_suffix(".tmp")
-    temp.write_text(trace.model_dump_json(indent=2), encoding="utf-8")
+    temp.write_bytes(
+        orjson.dumps(trace.model_dump(mode="json"), option=orjson.OPT_INDENT_2)
+    )
     temp.replace(trace_file)
 
-    entries = [entry for entry in load_task_index() if entry.task_id != trace.task_id]
-    entries.append(
-        TaskSummary(
-            task_id=trace.task_id,
-            plan_id=trace.plan_id,
-            status=trace.status,
-            started_at=trace.started_at,
-            ended_at=trace.ended_at,
-            agent=trace.agent,
-        )
+    summary = TaskSummary.model_construct(
+        task_id=trace.task_id,
+        plan_id=trace.plan_id,
+        status=trace.status,
+        started_at=trace.started_at,
+        started_at_ms=trace.started_at_ms,
+        ended_at=trace.ended_at,
+        agent=trace.agent,
     )
-    entries.sort(key=lambda item: item.started_at, reverse=True)
-    write_task_index(entries)
+    global _task_index_dirty, _task_index_timer
+    with _task_index_lock:
+        _seed_task_index()
+        _task_index[trace.task_id] = summary
+        _task_index_dirty = True
+        if _task_index_timer is None:
+            _task_index_timer = threading.Timer(
+                TASK_INDEX_FLUSH_DELAY_S, flush_task_index
+            )
+            _task_index_timer.daemon = True
+            _task_index_timer.start()
 
 
 def load_task_trace(task_id: UUID) -> TaskTrace:
@@ -355,29 +501,71 @@ def load_task_trace(task_id: UUID) -> TaskTrace:
     if not path.exists():
         raise HTTPException(status_code=404, detail=f"Task not found: {task_id}")
     try:
-        payload = json.loads(path.read_text(encoding="utf-8"))
-    except json.JSONDecodeError as exc:
+        return TRACE_ADAPTER.validate_json(path.read_bytes())
+    except ValidationError as exc:
         raise HTTPException(
             status_code=500, detail=f"Invalid task trace JSON: {exc}"
         ) from exc
-    return TaskTrace(**payload)
+
+
+LOG_FLUSH_INTERVAL_S = 0.1
+LOG_FLUSH_BATCH = 64
+
+_log_queue: queue.SimpleQueue[str] = queue.SimpleQueue()
+_log_flush_lock = threading.Lock()
+_log_writer_lock = threading.Lock()
+_log_writer_started = False
+
+
+def flush_backend_log() -> None:
+    """Drain queued log lines to disk in one batched write."""
+    with _log_flush_lock:
+        lines: list[str] = []
+        try:
+            while True:
+                lines.append(_log_queue.get_nowait())
+        except queue.Empty:
+            pass
+        if not lines:
+            return
+        path = backend_log_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("a", encoding="utf-8") as handle:
+            handle.writelines(lines)
+
+
+def _log_writer_loop() -> None:
+    while True:
+        time.sleep(LOG_FLUSH_INTERVAL_S)
+        flush_backend_log()
+
+
+def ensure_log_writer() -> None:
+    global _log_writer_started
+    if _log_writer_started:
+        return
+    with _log_writer_lock:
+        if _log_writer_started:
+            return
+        threading.Thread(
+            target=_log_writer_loop, name="liteclaw-log-writer", daemon=True
+        ).start()
+        _log_writer_started = True
 
 
 def append_backend_log(level: str, message: str) -> None:
-    path = backend_log_path()
-    path.parent.mkdir(parents=True, exist_ok=True)
-    line = f"{iso(now_utc())} [{level.upper()}] {message}\n"
-    with path.open("a", encoding="utf-8") as handle:
-        handle.write(line)
+    ensure_log_writer()
+    _log_queue.put(f"{iso_now()} [{level.upper()}] {message}\n")
+    if _log_queue.qsize() >= LOG_FLUSH_BATCH:
+        flush_backend_log()
 
 
 def write_models_state(state: ModelsState) -> None:
     path = models_registry_path()
     path.parent.mkdir(parents=True, exist_ok=True)
     temp_path = path.with_suffix(".tmp")
-    temp_path.write_text(
-        state.model_dump_json(indent=2),
-        encoding="utf-8",
+    temp_path.write_bytes(
+        orjson.dumps(state.model_dump(mode="json"), option=orjson.OPT_INDENT_2)
     )
     temp_path.replace(path)
 
@@ -389,23 +577,23 @@ def load_models_from_disk() -> ModelsState:
         write_models_state(state)
         return state
     try:
-        raw = json.loads(path.read_text(encoding="utf-8"))
-    except json.JSONDecodeError as exc:
+        return ModelsState.model_validate_json(path.read_bytes())
+    except ValidationError as exc:
         raise HTTPException(
             status_code=500, detail=f"Invalid models registry JSON: {exc}"
         ) from exc
-    return ModelsState(**raw)
 
 
 def get_models_snapshot() -> ModelsState:
-    with models_lock:
-        return current_models.model_copy(deep=True)
+    # current_models is replaced wholesale, never mutated in place, so the
+    # reference itself is a safe read-only snapshot.
+    return current_models
 
 
 def reload_models() -> ModelsState:
+    global current_models
     models = load_models_from_disk()
     with models_lock:
-        global current_models
         current_models = models
     return models
 
@@ -414,24 +602,23 @@ def load_config_from_disk() -> AppConfig:
     write_default_config_if_missing()
     path = config_path()
     try:
-        raw = json.loads(path.read_text(encoding="utf-8"))
-    except json.JSONDecodeError as exc:
+        return AppConfig.model_validate_json(path.read_bytes())
+    except ValidationError as exc:
         raise HTTPException(
             status_code=500, detail=f"Invalid config JSON: {exc}"
         ) from exc
-    return AppConfig(**raw)
 
 
 def get_config_snapshot() -> AppConfig:
-    with config_lock:
-        return current_config.model_copy(deep=True)
+    # AppConfig is frozen and swapped atomically on reload, so no lock or
+    # per-call deep copy is needed.
+    return current_config
 
 
 def reload_config() -> AppConfig:
+    global current_config
     config = load_config_from_disk()
-    with config_lock:
-        global current_config
-        current_config = config
+    current_config = config
     return config
 
 
@@ -442,7 +629,7 @@ def generate_doctor_report() -> DoctorReport:
     now = now_utc()
 
     checks.append(
-        DoctorCheck(
+        DoctorCheck.model_construct(
             name="cpu",
             status="ok",
             details=f"CPU cores detected: {os.cpu_count() or 1}.",
@@ -464,7 +651,7 @@ def generate_doctor_report() -> DoctorReport:
     except Exception:
         pass
     checks.append(
-        DoctorCheck(
+        DoctorCheck.model_construct(
             name="ram",
             status=ram_status,
             details=ram_details,
@@ -478,7 +665,7 @@ def generate_doctor_report() -> DoctorReport:
     disk = shutil.disk_usage(DATA_DIR)
     free_gib = disk.free / 1024**3
     checks.append(
-        DoctorCheck(
+        DoctorCheck.model_construct(
             name="disk",
             status="ok" if free_gib >= 2 else "warn",
             details=f"Free disk in data dir volume: {free_gib:.2f} GiB.",
@@ -499,7 +686,7 @@ def generate_doctor_report() -> DoctorReport:
         None,
     )
     checks.append(
-        DoctorCheck(
+        DoctorCheck.model_construct(
             name="model_installed",
             status="ok" if has_default and default_entry is not None else "warn",
             details=(
@@ -517,7 +704,7 @@ def generate_doctor_report() -> DoctorReport:
     if default_entry is not None and default_entry.local_path:
         loadable = Path(default_entry.local_path).exists()
     checks.append(
-        DoctorCheck(
+        DoctorCheck.model_construct(
             name="model_loadable",
             status="ok" if loadable else "warn",
             details=(
@@ -532,7 +719,7 @@ def generate_doctor_report() -> DoctorReport:
     )
 
     checks.append(
-        DoctorCheck(
+        DoctorCheck.model_construct(
             name="backend_health",
             status="ok",
             details=f"Backend service is responding at {iso(now)}.",
@@ -541,7 +728,7 @@ def generate_doctor_report() -> DoctorReport:
 
     permissions_ok = len(config.allowed_folders) > 0
     checks.append(
-        DoctorCheck(
+        DoctorCheck.model_construct(
             name="permissions_config",
             status="ok" if permissions_ok else "warn",
             details=(
@@ -567,7 +754,7 @@ def generate_doctor_report() -> DoctorReport:
         f"Doctor report: {overall.upper()} with "
         f"{statuses.count('ok')} ok, {statuses.count('warn')} warn, {statuses.count('fail')} fail checks."
     )
-    return DoctorReport(
+    return DoctorReport.model_construct(
         report_id=uuid4(),
         generated_at=iso(now),
         overall_status=overall,
@@ -576,18 +763,70 @@ def generate_doctor_report() -> DoctorReport:
     )
 
 
-def redact_line(line: str, redact_paths: bool) -> str:
-    if not redact_paths:
-        return line
-    rewritten = line
-    rewritten = rewritten.replace(str(DATA_DIR.resolve()), "{{DATA_DIR}}")
-    for idx, folder in enumerate(get_config_snapshot().allowed_folders, start=1):
-        marker = f"{{{{ALLOWED_FOLDER_{idx}}}}}"
+@lru_cache(maxsize=32)
+def build_redaction(
+    data_dir: str, folders: tuple[str, ...]
+) -> tuple[re.Pattern[str], dict[str, str]] | None:
+    replacements: dict[str, str] = {data_dir: "{{DATA_DIR}}"}
+    for idx, folder in enumerate(folders, start=1):
         try:
-            rewritten = rewritten.replace(str(Path(folder).resolve()), marker)
+            resolved = str(Path(folder).resolve())
         except Exception:
             continue
-    return rewritten
+        replacements.setdefault(resolved, f"{{{{ALLOWED_FOLDER_{idx}}}}}")
+    if not replacements:
+        return None
+    # Longest paths first so nested folders redact before their parents.
+    pattern = re.compile(
+        "|".join(
+            re.escape(path)
+            for path in sorted(replacements, key=len, reverse=True)
+        )
+    )
+    return pattern, replacements
+
+
+DOCTOR_REPORT_TTL_S = 5.0
+
+_doctor_cache: tuple[float, str, DoctorReport] | None = None
+_doctor_cache_lock = threading.Lock()
+
+
+def get_doctor_report_cached() -> DoctorReport:
+    """Reuse a recent doctor report; the syscalls it probes rarely change."""
+    global _doctor_cache
+    now = time.monotonic()
+    key = str(DATA_DIR)
+    cached = _doctor_cache
+    if (
+        cached is not None
+        and cached[1] == key
+        and now - cached[0] < DOCTOR_REPORT_TTL_S
+    ):
+        return cached[2]
+    with _doctor_cache_lock:
+        cached = _doctor_cache
+        if (
+            cached is not None
+            and cached[1] == key
+            and now - cached[0] < DOCTOR_REPORT_TTL_S
+        ):
+            return cached[2]
+        report = generate_doctor_report()
+        _doctor_cache = (now, key, report)
+        return report
+
+
+def redact_text(text: str, redact_paths: bool) -> str:
+    if not redact_paths:
+        return text
+    redaction = build_redaction(
+        str(DATA_DIR.resolve()), tuple(get_config_snapshot().allowed_folders)
+    )
+    if redaction is None:
+        return text
+    pattern, replacements = redaction
+    return pattern.sub(lambda match: replacements[match.group(0)], text)
 
 
 def task_trace_to_markdown(trace: TaskTrace) -> str:
@@ -601,10 +840,12 @@ def task_trace_to_markdown(trace: TaskTrace) -> str:
         "",
         "## Events",
     ]
+    append = lines.append
     for event in trace.events:
-        step = f" ({event.step_id})" if event.step_id else ""
-        lines.append(
-            f"- [{event.timestamp}] [{event.level.upper()}]{step} {event.message}"
+        step = " (%s)" % event.step_id if event.step_id else ""
+        append(
+            "- [%s] [%s]%s %s"
+            % (event.timestamp, event.level.upper(), step, event.message)
         )
     return "\n".join(lines)
 
@@ -617,53 +858,60 @@ def doctor_report_to_markdown(report: DoctorReport) -> str:
         "",
         "## Checks",
     ]
+    append = lines.append
     for check in report.checks:
         recommendation = (
-            f" Recommendation: {check.recommendation}" if check.recommendation else ""
+            " Recommendation: %s" % check.recommendation
+            if check.recommendation
+            else ""
         )
-        lines.append(
-            f"- **{check.name}** [{check.status}] {check.details}{recommendation}"
+        append(
+            "- **%s** [%s] %s%s"
+            % (check.name, check.status, check.details, recommendation)
         )
     if report.summary:
         lines.extend(["", f"Summary: {report.summary}"])
     return "\n".join(lines)
 
 
-def detect_search_query(prompt: str) -> str:
-    quoted = re.findall(r"'([^']+)'|\"([^\"]+)\"", prompt)
+QUOTED_RE = re.compile(r"'([^']+)'|\"([^\"]+)\"")
+BACKTICK_RE = re.compile(r"`([^`]+)`")
+WORD_RE = re.compile(r"[a-z0-9]+")
+SHELL_INDICATOR_RE = re.compile(r"run command|execute command|shell|terminal")
+SEARCH_VERBS = frozenset({"search", "find"})
+FILE_SCOPE_WORDS = frozenset(
+    {"file", "files", "folder", "folders", "project", "directory", "directories"}
+)
+FILE_WORDS = frozenset({"file", "files"})
+HEDGE_WORDS = frozenset({"help", "maybe", "around"})
+
+
+def detect_search_query(quoted: list[tuple[str, str]]) -> str:
     for pair in quoted:
         value = pair[0] or pair[1]
         if value.strip():
             return value.strip()
-    if "todo" in prompt.lower():
-        return "TODO"
     return "TODO"
 
 
-def detect_file_search_confidence(prompt: str) -> tuple[float, bool]:
-    lowered = prompt.lower()
-    has_search_verb = any(word in lowered for word in ("search", "find", "look for"))
-    has_file_scope = any(
-        word in lowered for word in ("file", "folder", "project", "directory")
-    )
-    has_quoted_target = bool(re.findall(r"'([^']+)'|\"([^\"]+)\"", prompt))
+def detect_file_search_confidence(
+    lowered: str, words: frozenset[str], has_quoted: bool
+) -> tuple[float, bool]:
+    has_search_verb = not words.isdisjoint(SEARCH_VERBS) or "look for" in lowered
+    has_file_scope = not words.isdisjoint(FILE_SCOPE_WORDS)
 
-    if has_search_verb and has_file_scope and has_quoted_target:
+    if has_search_verb and has_file_scope and has_quoted:
         return 0.95, True
     if has_search_verb and has_file_scope:
         return 0.82, True
-    if "file" in lowered and any(
-        word in lowered for word in ("help", "maybe", "around")
-    ):
+    if not words.isdisjoint(FILE_WORDS) and not words.isdisjoint(HEDGE_WORDS):
         return 0.45, False
     return 0.55, False
 
 
-def detect_shell_exec_confidence(prompt: str) -> tuple[float, bool]:
-    lowered = prompt.lower().strip()
-    indicators = ("run command", "execute command", "shell", "terminal")
-    has_indicator = any(token in lowered for token in indicators)
-    has_code_block = "`" in prompt
+def detect_shell_exec_confidence(lowered: str) -> tuple[float, bool]:
+    has_indicator = SHELL_INDICATOR_RE.search(lowered) is not None
+    has_code_block = "`" in lowered
     if has_indicator and has_code_block:
         return 0.93, True
     if has_indicator:
@@ -671,13 +919,12 @@ def detect_shell_exec_confidence(prompt: str) -> tuple[float, bool]:
     return 0.40, False
 
 
-def extract_shell_command(prompt: str) -> str:
-    inline = re.findall(r"`([^`]+)`", prompt)
+def extract_shell_command(prompt: str, lowered: str) -> str:
+    inline = BACKTICK_RE.findall(prompt)
     for item in inline:
         if item.strip():
             return item.strip()
     marker = "run command"
-    lowered = prompt.lower()
     if marker in lowered:
         idx = lowered.index(marker) + len(marker)
         tail = prompt[idx:].strip(": ").strip()
@@ -686,20 +933,47 @@ def extract_shell_command(prompt: str) -> str:
     return "pwd"
 
 
+@lru_cache(maxsize=1024)
+def route_signals(prompt: str) -> tuple[str, str, float, bool, float, bool]:
+    """Per-prompt routing signals; prompts repeat often enough to cache."""
+    lowered = prompt.lower()
+    quoted = QUOTED_RE.findall(prompt)
+    words = frozenset(WORD_RE.findall(lowered))
+    query = detect_search_query(quoted)
+    command = extract_shell_command(prompt, lowered)
+    router_confidence, should_route_file_search = detect_file_search_confidence(
+        lowered, words, bool(quoted)
+    )
+    shell_confidence, should_route_shell_exec = detect_shell_exec_confidence(lowered)
+    return (
+        query,
+        command,
+        router_confidence,
+        should_route_file_search,
+        shell_confidence,
+        should_route_shell_exec,
+    )
+
+
 def build_plan(request: RouterPlanRequest) -> Plan:
     prompt = request.prompt.strip()
-    lowered = prompt.lower()
     plan_id = uuid4()
-    created_at = iso(now_utc())
+    created_at = iso_now()
     base_folder = (
         request.allowed_folders[0] if request.allowed_folders else str(Path.cwd())
     )
 
-    router_confidence, should_route_file_search = detect_file_search_confidence(prompt)
-    shell_confidence, should_route_shell_exec = detect_shell_exec_confidence(prompt)
+    (
+        query,
+        command,
+        router_confidence,
+        should_route_file_search,
+        shell_confidence,
+        should_route_shell_exec,
+    ) = route_signals(prompt)
 
     if router_confidence < ROUTER_CONFIDENCE_THRESHOLD:
-        step = Step(
+        step = Step.model_construct(
             step_id="step-1",
             agent="conversation",
             action="conversation.respond",
@@ -707,7 +981,7 @@ def build_plan(request: RouterPlanRequest) -> Plan:
             side_effects="none",
             preview="Router confidence is low. Respond conversationally with no system actions.",
         )
-        return Plan(
+        return Plan.model_construct(
             plan_id=plan_id,
             created_at=created_at,
             user_intent_summary="Respond safely due to ambiguous intent.",
@@ -722,8 +996,7 @@ def build_plan(request: RouterPlanRequest) -> Plan:
         )
 
     if should_route_file_search:
-        query = detect_search_query(prompt)
-        step = Step(
+        step = Step.model_construct(
             step_id="step-1",
             agent="file",
             action="file.search",
@@ -738,14 +1011,14 @@ def build_plan(request: RouterPlanRequest) -> Plan:
             preview=f"Search for '{query}' under {base_folder} and return up to 10 matches.",
         )
         perms = [
-            PermissionScope(
+            PermissionScope.model_construct(
                 type="file",
                 mode="read",
                 targets=[base_folder],
                 reason="Need read access to search files in the selected folder.",
             )
         ]
-        return Plan(
+        return Plan.model_construct(
             plan_id=plan_id,
             created_at=created_at,
             user_intent_summary=f"Search files for '{query}'.",
@@ -760,8 +1033,7 @@ def build_plan(request: RouterPlanRequest) -> Plan:
         )
 
     if should_route_shell_exec and shell_confidence >= SHELL_CONFIDENCE_THRESHOLD:
-        command = extract_shell_command(prompt)
-        step = Step(
+        step = Step.model_construct(
             step_id="step-1",
             agent="shell",
             action="shell.exec",
@@ -775,20 +1047,20 @@ def build_plan(request: RouterPlanRequest) -> Plan:
             preview=f"Execute shell command in {base_folder}: {command}",
         )
         perms = [
-            PermissionScope(
+            PermissionScope.model_construct(
                 type="file",
                 mode="read",
                 targets=[base_folder],
                 reason="Need folder scope to constrain shell working directory.",
             ),
-            PermissionScope(
+            PermissionScope.model_construct(
                 type="shell",
                 mode="exec",
                 targets=[command],
                 reason="Need explicit approval to execute shell commands.",
             ),
         ]
-        return Plan(
+        return Plan.model_construct(
             plan_id=plan_id,
             created_at=created_at,
             user_intent_summary="Execute a shell command with guardrails.",
@@ -802,7 +1074,7 @@ def build_plan(request: RouterPlanRequest) -> Plan:
             explain="Shell command execution requires explicit approval and strict policy checks.",
         )
 
-    step = Step(
+    step = Step.model_construct(
         step_id="step-1",
         agent="conversation",
         action="conversation.respond",
@@ -810,7 +1082,7 @@ def build_plan(request: RouterPlanRequest) -> Plan:
         side_effects="none",
         preview="Generate a direct response without system actions.",
     )
-    return Plan(
+    return Plan.model_construct(
         plan_id=plan_id,
         created_at=created_at,
         user_intent_summary="Answer the user prompt directly.",
@@ -826,38 +1098,45 @@ def build_plan(request: RouterPlanRequest) -> Plan:
 
 
 def action_card_from_plan(plan: Plan) -> ActionCard:
-    what_will_happen = [step.preview for step in plan.steps]
-    targets = ActionCardTargets()
+    what_will_happen: list[str] = []
+    targets = ActionCardTargets.model_construct()
     warnings = ["Review scope before approval."]
 
     for step in plan.steps:
-        if step.action.startswith("file."):
-            if "root" in step.inputs:
-                targets.paths.append(str(step.inputs["root"]))
-            if "folder" in step.inputs:
-                targets.paths.append(str(step.inputs["folder"]))
-            if "path" in step.inputs:
-                targets.files.append(str(step.inputs["path"]))
-        if step.action == "file.search" and "query" in step.inputs:
-            warnings.append(f"Reads files to search for '{step.inputs['query']}'.")
-        if step.action.startswith("shell.") and "command" in step.inputs:
-            targets.commands.append(str(step.inputs["command"]))
-        if step.action.startswith("browser.") and "url" in step.inputs:
-            targets.urls.append(str(step.inputs["url"]))
-        if step.side_effects in {"write", "exec", "network"}:
-            warnings.append(
-                f"Step {step.step_id} has side effects: {step.side_effects}."
-            )
-
-    return ActionCard(
+        action = step.action
+        inputs = step.inputs
+        side_effects = step.side_effects
+        what_will_happen.append(step.preview)
+        prefix = action.partition(".")[0]
+        if prefix == "file":
+            if "root" in inputs:
+                targets.paths.append(str(inputs["root"]))
+            if "folder" in inputs:
+                targets.paths.append(str(inputs["folder"]))
+            if "path" in inputs:
+                targets.files.append(str(inputs["path"]))
+            if action == "file.search" and "query" in inputs:
+                warnings.append(f"Reads files to search for '{inputs['query']}'.")
+        elif prefix == "shell":
+            if "command" in inputs:
+                targets.commands.append(str(inputs["command"]))
+        elif prefix == "browser":
+            if "url" in inputs:
+                targets.urls.append(str(inputs["url"]))
+        if side_effects != "none":
+            warnings.append(f"Step {step.step_id} has side effects: {side_effects}.")
+
+    return ActionCard.model_construct(
         card_id=uuid4(),
         plan_id=plan.plan_id,
         title="Approval Required",
         what_will_happen=what_will_happen,
         exact_targets=targets,
         warnings=warnings,
-        approve_token_request=ActionCardApproveTokenRequest(
-            payload=ActionCardApproveTokenRequestPayload(plan_id=plan.plan_id)
+        approve_token_request=ActionCardApproveTokenRequest.model_construct(
+            payload=ActionCardApproveTokenRequestPayload.model_construct(
+                plan_id=plan.plan_id
+            )
         ),
     )
 
@@ -866,6 +1145,26 @@ def plan_has_side_effects(plan: Plan) -> bool:
     return any(step.side_effects != "none" for step in plan.steps)
 
 
+def token_expires_ms(token: ApprovalToken) -> int:
+    if token.expires_at_ms is not None:
+        return token.expires_at_ms
+    expires = datetime.fromisoformat(token.expires_at.replace("Z", "+00:00"))
+    return int(expires.timestamp() * 1000)
+
+
+def prune_approval_tokens(now_ms: int) -> None:
+    """Drop expired tokens and cap the store. Caller holds approval_lock."""
+    expired = [
+        token_id
+        for token_id, token in approval_tokens.items()
+        if now_ms >= token_expires_ms(token)
+    ]
+    for token_id in expired:
+        del approval_tokens[token_id]
+    while len(approval_tokens) >= APPROVAL_TOKEN_CAP:
+        approval_tokens.pop(next(iter(approval_tokens)))
+
+
 def consume_approval_token(
     plan: Plan, approval_token_id: UUID | None, required: bool
 ) -> ApprovalToken | None:
@@ -873,6 +1172,9 @@ def consume_approval_token(
         return None
     if approval_token_id is None:
         raise HTTPException(status_code=403, detail="Approval token required")
+    now = now_utc()
+    now_ms = int(now.timestamp() * 1000)
+    consumed_at = iso(now)
     with approval_lock:
         token = approval_tokens.get(approval_token_id)
         if token is None:
@@ -883,15 +1185,15 @@ def consume_approval_token(
             )
         if token.consumed_at is not None:
             raise HTTPException(status_code=403, detail="Approval token already used")
-        if now_utc() >= datetime.fromisoformat(token.expires_at.replace("Z", "+00:00")):
+        if now_ms >= token_expires_ms(token):
             raise HTTPException(status_code=403, detail="Approval token expired")
-        token.consumed_at = iso(now_utc())
+        token.consumed_at = consumed_at
         approval_tokens[token.token_id] = token
         return token
 
 
 @lru_cache(maxsize=1)
-def get_blocked_paths() -> list[Path]:
+def get_blocked_prefixes() -> tuple[str, ...]:
     if os.name == "nt":
         blocked = [
             Path(os.environ.get("SystemRoot", r"C:\Windows")),
@@ -914,62 +1216,74 @@ def get_blocked_paths() -> list[Path]:
             Path("/usr"),
             Path("/var"),
         ]
-    return [path.resolve() for path in blocked]
+    return tuple(path_prefix(path.resolve()) for path in blocked)
 
 
-def within_path(child: Path, parent: Path) -> bool:
-    try:
-        child.resolve().relative_to(parent.resolve())
-        return True
-    except ValueError:
-        return False
+def path_prefix(resolved: Path) -> str:
+    """Prefix-comparison key for a path that has already been resolved.
+
+    Appending the separator makes ``startswith`` an exact containment check:
+    it matches the root itself and its descendants, but not siblings that
+    merely share a name prefix.
+    """
+    return str(resolved) + os.sep
+
+
+def is_blocked_path(resolved: Path) -> bool:
+    """Check an already-resolved path against the blocked system roots."""
+    return path_prefix(resolved).startswith(get_blocked_prefixes())
 
 
-def is_blocked_path(candidate: Path) -> bool:
-    resolved = candidate.resolve()
-    return any(within_path(resolved, blocked) for blocked in get_blocked_paths())
+def get_allowed_read_prefixes(plan: Plan) -> tuple[str, ...]:
+    return tuple(
+        path_prefix(Path(target).resolve())
+        for permission in plan.required_permissions
+        if permission.type == "file" and permission.mode == "read"
+        for target in permission.targets
+    )
 
 
-def get_allowed_read_roots(plan: Plan) -> list[Path]:
-    roots: list[Path] = []
-    for permission in plan.required_permissions:
-        if permission.type == "file" and permission.mode == "read":
-            roots.extend(Path(target).resolve() for target in permission.targets)
-    return roots
+@lru_cache(maxsize=32)
+def resolve_folder_prefixes(folders: tuple[str, ...]) -> tuple[str, ...]:
+    return tuple(path_prefix(Path(folder).resolve()) for folder in folders)
 
 
-def get_config_allowed_roots() -> list[Path]:
+def get_config_allowed_prefixes() -> tuple[str, ...]:
     config = get_config_snapshot()
-    return [Path(folder).resolve() for folder in config.allowed_folders]
+    return resolve_folder_prefixes(tuple(config.allowed_folders))
 
 
-def ensure_file_read_scope(target_path: Path, allowed_roots: list[Path]) -> None:
+def ensure_file_read_scope(target_path: Path, allowed_prefixes: tuple[str, ...]) -> None:
     resolved = target_path.resolve()
-    if is_blocked_path(resolved):
+    key = path_prefix(resolved)
+    if key.startswith(get_blocked_prefixes()):
         raise HTTPException(status_code=403, detail=f"Blocked path: {resolved}")
-    config_allowed_roots = get_config_allowed_roots()
-    if not config_allowed_roots:
+    config_prefixes = get_config_allowed_prefixes()
+    if not config_prefixes:
         raise HTTPException(
             status_code=403,
             detail="No folders are allowed yet. Add a folder to continue.",
         )
-    if not any(within_path(resolved, root) for root in config_allowed_roots):
+    if not key.startswith(config_prefixes):
         raise HTTPException(
             status_code=403,
             detail=f"Path is outside configured allowed folders: {resolved}",
         )
-    if not allowed_roots:
+    if not allowed_prefixes:
         raise HTTPException(
             status_code=403, detail="No allowed file read roots configured"
         )
-    if not any(within_path(resolved, root) for root in allowed_roots):
+    if not key.startswith(allowed_prefixes):
         raise HTTPException(
             status_code=403, detail=f"Path is outside allowed read scope: {resolved}"
         )
 
 
-def is_probably_binary(path: Path) -> bool:
-    binary_exts = {
+BINARY_MAGIC_PREFIXES = (b"\x89PNG", b"%PDF", b"\x7fELF", b"PK\x03\x04")
+
+
+BINARY_EXTENSIONS = frozenset(
+    {
         ".exe",
         ".dll",
         ".bin",
@@ -986,36 +1300,349 @@ def is_probably_binary(path: Path) -> bool:
         ".mp4",
         ".mp3",
     }
-    if path.suffix.lower() in binary_exts:
+)
+# endswith with a tuple is a single C call, used to reject entries by name
+# before a Path is even constructed.
+BINARY_EXTENSION_SUFFIXES = tuple(BINARY_EXTENSIONS)
+
+
+@lru_cache(maxsize=4096)
+def _dir_in_scope(
+    parent: str,
+    config_prefixes: tuple[str, ...],
+    allowed_prefixes: tuple[str, ...],
+) -> bool:
+    key = path_prefix(Path(parent).resolve())
+    return (
+        not key.startswith(get_blocked_prefixes())
+        and bool(config_prefixes)
+        and key.startswith(config_prefixes)
+        and bool(allowed_prefixes)
+        and key.startswith(allowed_prefixes)
+    )
+
+
+def ensure_file_read_scope_cached(
+    file_path: Path, allowed_prefixes: tuple[str, ...]
+) -> None:
+    """Scope check that memoises by parent directory.
+
+    Walks skip symlinks, so every sibling of an in-scope directory resolves
+    under the same prefix; caching per parent avoids a realpath() syscall
+    per file. Out-of-scope paths fall through to the uncached check for its
+    exact error detail.
+    """
+    parent = os.path.dirname(str(file_path))
+    if _dir_in_scope(parent, get_config_allowed_prefixes(), allowed_prefixes):
+        return
+    ensure_file_read_scope(file_path, allowed_prefixes)
+
+
+def is_probably_binary(path: Path) -> bool:
+    if path.suffix.lower() in BINARY_EXTENSIONS:
         return True
     try:
-        chunk = path.read_bytes()[:2048]
+        with open(path, "rb") as handle:
+            chunk = handle.read(2048)
     except OSError:
         return True
+    if chunk.startswith(BINARY_MAGIC_PREFIXES):
+        return True
     return b"\x00" in chunk
 
 
-def make_snippet(text: str, query: str, max_snippet_chars: int) -> str:
-    query_lower = query.lower()
-    text_lower = text.lower()
-    index = text_lower.find(query_lower)
+_SNIPPET_NORMALIZE = str.maketrans("\n\r\t", "   ")
+
+
+def make_snippet(text: str, index: int, max_snippet_chars: int) -> str:
     if index < 0:
         return ""
     start = max(0, index - (max_snippet_chars // 2))
     end = min(len(text), start + max_snippet_chars)
-    snippet = text[start:end].replace("\n", " ").strip()
+    snippet = text[start:end].translate(_SNIPPET_NORMALIZE).strip()
     return snippet[:max_snippet_chars]
 
 
-def matches_glob(relative_path: str, patterns: list[str]) -> bool:
-    for pattern in patterns:
-        if fnmatch(relative_path, pattern):
-            return True
-        if pattern.startswith("**/") and fnmatch(relative_path, pattern[3:]):
-            return True
+def _scandir_recursive(path: str) -> Iterator[os.DirEntry[str]]:
+    """Yield file entries under ``path`` depth-first, skipping symlinks.
+
+    DirEntry caches the file type from the directory listing, so this avoids
+    the extra stat() per entry that ``Path.rglob`` + ``is_file()`` incurs.
+    """
+    try:
+        entries = os.scandir(path)
+    except OSError:
+        return
+    with entries:
+        for entry in entries:
+            try:
+                if entry.is_symlink():
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIP_DIRS:
+                        yield from _scandir_recursive(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+            except OSError:
+                continue
+
+
+SKIP_DIRS = frozenset(
+    {".git", "node_modules", ".venv", "__pycache__", "dist", "build"}
+)
+
+GlobState = tuple[int, int]
+
+
+@lru_cache(maxsize=256)
+def _segment_regex(segment: str) -> re.Pattern[str]:
+    return re.compile(translate(segment))
+
+
+class GlobMatcher:
+    """Glob patterns compiled into per-segment matchers for pruned walks.
+
+    Each pattern is split into path segments; ``**`` matches any number of
+    segments (including zero) and other segments are fnmatch'd against a
+    single path component. Tracking the set of live (pattern, segment)
+    states while descending lets the walk skip whole directories that no
+    pattern's remaining segments could ever match.
+    """
+
+    def __init__(self, patterns: tuple[str, ...]) -> None:
+        raw = [
+            tuple(seg for seg in pattern.split("/") if seg)
+            for pattern in patterns
+            if pattern
+        ]
+        self.accept_all = not raw or any(
+            segs in ((), ("**",), ("**", "*")) for segs in raw
+        )
+        # Translate each segment to a compiled regex once so the walk does a
+        # C-level match per component instead of an fnmatch call.
+        self.patterns = [
+            tuple(
+                seg if seg == "**" else _segment_regex(seg) for seg in segs
+            )
+            for segs in raw
+        ]
+        # When every pattern is the common "**/*.ext" shape, matching
+        # collapses to one endswith call per file instead of running the
+        # state machine.
+        suffixes: list[str] = []
+        for segs in raw:
+            if (
+                len(segs) == 2
+                and segs[0] == "**"
+                and segs[1].startswith("*.")
+                and not any(ch in segs[1][1:] for ch in "*?[")
+            ):
+                suffixes.append(segs[1][1:])
+            else:
+                suffixes.clear()
+                break
+        self.suffixes: tuple[str, ...] | None = (
+            tuple(suffixes) if suffixes and not self.accept_all else None
+        )
+
+    def initial_states(self) -> frozenset[GlobState]:
+        return frozenset((index, 0) for index in range(len(self.patterns)))
+
+    def advance(self, states: frozenset[GlobState], name: str) -> frozenset[GlobState]:
+        """States that survive consuming one path component ``name``."""
+        survivors: set[GlobState] = set()
+        pending = list(states)
+        seen: set[GlobState] = set()
+        while pending:
+            state = pending.pop()
+            if state in seen:
+                continue
+            seen.add(state)
+            index, position = state
+            segments = self.patterns[index]
+            if position >= len(segments):
+                continue
+            segment = segments[position]
+            if segment == "**":
+                survivors.add(state)
+                pending.append((index, position + 1))
+            elif segment.match(name) is not None:
+                survivors.add((index, position + 1))
+        return frozenset(survivors)
+
+    def matches_file(self, states: frozenset[GlobState], name: str) -> bool:
+        for index, position in self.advance(states, name):
+            segments = self.patterns[index]
+            if all(segment == "**" for segment in segments[position:]):
+                return True
+        return False
+
+    def walk(self, root: str) -> Iterator[tuple[os.DirEntry[str], bool]]:
+        """Yield (entry, matched) for files under ``root``, pruning
+        directories no pattern can reach."""
+        if self.accept_all:
+            for entry in _scandir_recursive(root):
+                yield entry, True
+            return
+        if self.suffixes is not None:
+            suffixes = self.suffixes
+            for entry in _scandir_recursive(root):
+                yield entry, entry.name.endswith(suffixes)
+            return
+        yield from self._walk(root, self.initial_states())
+
+    def _walk(
+        self, path: str, states: frozenset[GlobState]
+    ) -> Iterator[tuple[os.DirEntry[str], bool]]:
+        try:
+            entries = os.scandir(path)
+        except OSError:
+            return
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_symlink():
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name in SKIP_DIRS:
+                            continue
+                        child_states = self.advance(states, entry.name)
+                        if child_states:
+                            yield from self._walk(entry.path, child_states)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry, self.matches_file(states, entry.name)
+                except OSError:
+                    continue
+
+
+@lru_cache(maxsize=64)
+def compile_globs(patterns: tuple[str, ...]) -> GlobMatcher:
+    return GlobMatcher(patterns)
+
+
+SEARCH_MAX_WORKERS = 32
+SEARCH_CACHE_MAX = 128
+SEARCH_PROCESS_THRESHOLD = 10_000
+
+_search_pool: ProcessPoolExecutor | None = None
+_search_pool_lock = threading.Lock()
+
+
+def get_search_pool() -> ProcessPoolExecutor:
+    """Process pool for bulk searches, created on first use.
+
+    Spawning workers costs tens of milliseconds per process, so the pool
+    is kept alive across requests instead of being rebuilt per search.
+    """
+    global _search_pool
+    with _search_pool_lock:
+        if _search_pool is None:
+            _search_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+        return _search_pool
+
+
+def shutdown_search_pool() -> None:
+    global _search_pool
+    with _search_pool_lock:
+        if _search_pool is not None:
+            _search_pool.shutdown(wait=False, cancel_futures=True)
+            _search_pool = None
+
+_search_cache: OrderedDict[tuple[Any, ...], tuple[int, dict[str, Any]]] = OrderedDict()
+_search_cache_lock = threading.Lock()
+
+
+def search_worker_count() -> int:
+    configured = get_config_snapshot().search_workers
+    if configured > 0:
+        return min(configured, SEARCH_MAX_WORKERS)
+    return min(SEARCH_MAX_WORKERS, (os.cpu_count() or 1) * 4)
+
+
+try:  # Optional accelerator: a JIT'd DFA scans an order of magnitude
+    # faster than Python's backtracking engine on large corpora.
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+
+@lru_cache(maxsize=128)
+def compile_query_pattern(query: str) -> re.Pattern[bytes]:
+    return re.compile(re.escape(query).encode("utf-8"), re.IGNORECASE)
+
+
+@lru_cache(maxsize=128)
+def _hyperscan_database(query: str) -> "hyperscan.Database":
+    database = hyperscan.Database()
+    database.compile(
+        expressions=[re.escape(query).encode("utf-8")],
+        ids=[0],
+        flags=[hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_CASELESS],
+    )
+    return database
+
+
+def query_found_in_buffer(buffer: Any, query: str) -> bool:
+    """First-match scan of a bytes-like buffer for the literal query."""
+    if hyperscan is None:
+        return compile_query_pattern(query).search(buffer) is not None
+
+    def on_match(_id: int, _start: int, _end: int, _flags: int, _ctx: Any) -> int:
+        return 1  # terminate the scan at the first match
+
+    try:
+        # Pass the buffer through untouched so mmap pages are scanned in
+        # place instead of being copied into a bytes object first.
+        _hyperscan_database(query).scan(buffer, match_event_handler=on_match)
+    except hyperscan.ScanTerminated:
+        # Terminating the scan from the handler is how a first-match hit
+        # is reported.
+        return True
     return False
 
 
+def _probe_search_file(
+    path_str: str,
+    *,
+    query: str,
+    query_lower: str,
+    max_snippet_chars: int,
+) -> tuple[str, dict[str, Any] | None]:
+    """Scan one candidate file and classify it for file_search.
+
+    Module-level so it can be shipped to worker processes as well as
+    threads. The file is mapped rather than read: the regex scans pages as
+    the kernel faults them in and nothing is copied into Python until a
+    file actually matches.
+    """
+    try:
+        with open(path_str, "rb") as handle:
+            size = os.fstat(handle.fileno()).st_size
+            if size == 0:
+                return "no_match", None
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                head = buffer[:2048]
+                if head.startswith(BINARY_MAGIC_PREFIXES) or b"\x00" in head:
+                    return "binary", None
+                if not query_found_in_buffer(buffer, query):
+                    return "no_match", None
+                data = buffer[:]
+    except (OSError, ValueError):
+        return "unreadable", None
+    try:
+        content = data.decode("utf-8")
+    except UnicodeDecodeError:
+        return "non_text", None
+    index = content.lower().find(query_lower)
+    if index < 0:
+        return "no_match", None
+    return "match", {
+        "path": path_str,
+        "snippet": make_snippet(content, index, max_snippet_chars),
+        "match": query,
+    }
+
+
 def file_search(
     *,
     root: str,
@@ -1023,10 +1650,10 @@ def file_search(
     globs: list[str],
     max_results: int,
     max_snippet_chars: int,
-    allowed_roots: list[Path],
+    allowed_prefixes: tuple[str, ...],
 ) -> dict[str, Any]:
     root_path = Path(root).resolve()
-    ensure_file_read_scope(root_path, allowed_roots)
+    ensure_file_read_scope(root_path, allowed_prefixes)
     if not root_path.exists() or not root_path.is_dir():
         raise HTTPException(
             status_code=400, detail=f"Root folder not found: {root_path}"
@@ -1034,6 +1661,28 @@ def file_search(
     patterns = globs or ["**/*"]
     max_results = max(1, min(max_results, 100))
     max_snippet_chars = max(32, min(max_snippet_chars, 2000))
+    root_str = str(root_path)
+    # Agent loops tend to repeat the same search within seconds; the root
+    # directory's mtime changes whenever a top-level entry is added or
+    # removed, which bounds how stale a cached result can be.
+    cache_key = (
+        root_str,
+        query,
+        tuple(patterns),
+        max_results,
+        max_snippet_chars,
+        allowed_prefixes,
+    )
+    try:
+        signature = os.stat(root_str).st_mtime_ns
+    except OSError:
+        signature = -1
+    with _search_cache_lock:
+        cached = _search_cache.get(cache_key)
+        if cached is not None and cached[0] == signature:
+            _search_cache.move_to_end(cache_key)
+            return cached[1]
+    query_lower = query.lower()
     start = time.perf_counter()
     scanned = 0
     skipped_binary = 0
@@ -1041,44 +1690,78 @@ def file_search(
     warnings: list[str] = []
     results: list[dict[str, Any]] = []
 
-    for file_path in sorted(root_path.rglob("*"), key=lambda p: str(p).lower()):
-        if not file_path.is_file():
-            continue
-        relative = file_path.relative_to(root_path).as_posix()
-        if patterns and not matches_glob(relative, patterns):
+    matcher = compile_globs(tuple(patterns))
+    candidates: list[Path] = []
+    for entry, matched in matcher.walk(root_str):
+        if not matched:
             skipped_pattern += 1
             continue
-        ensure_file_read_scope(file_path, allowed_roots)
-        scanned += 1
-        if is_probably_binary(file_path):
+        if entry.name.lower().endswith(BINARY_EXTENSION_SUFFIXES):
+            scanned += 1
             skipped_binary += 1
             if len(warnings) < 5:
-                warnings.append(f"skipped binary file: {file_path}")
+                warnings.append(f"skipped binary file: {entry.path}")
             continue
-        try:
-            content = file_path.read_text(encoding="utf-8")
-        except UnicodeDecodeError:
+        file_path = Path(entry.path)
+        ensure_file_read_scope_cached(file_path, allowed_prefixes)
+        candidates.append(file_path)
+
+    def consume(file_path: Path, kind: str, payload: dict[str, Any] | None) -> bool:
+        nonlocal scanned, skipped_binary
+        scanned += 1
+        if kind == "match" and payload is not None:
+            results.append(payload)
+            return len(results) >= max_results
+        if kind in ("binary", "non_text"):
             skipped_binary += 1
             if len(warnings) < 5:
-                warnings.append(f"skipped non-text file: {file_path}")
-            continue
-        except OSError:
-            if len(warnings) < 5:
-                warnings.append(f"skipped unreadable file: {file_path}")
-            continue
-        if query.lower() in content.lower():
-            results.append(
-                {
-                    "path": str(file_path),
-                    "snippet": make_snippet(content, query, max_snippet_chars),
-                    "match": query,
-                }
-            )
-            if len(results) >= max_results:
+                label = "binary" if kind == "binary" else "non-text"
+                warnings.append(f"skipped {label} file: {file_path}")
+        elif kind == "unreadable" and len(warnings) < 5:
+            warnings.append(f"skipped unreadable file: {file_path}")
+        return False
+
+    probe = partial(
+        _probe_search_file,
+        query=query,
+        query_lower=query_lower,
+        max_snippet_chars=max_snippet_chars,
+    )
+    use_processes = (
+        len(candidates) > SEARCH_PROCESS_THRESHOLD
+        and get_config_snapshot().search_processes
+    )
+    if use_processes:
+        # Past this size the decode/lower/find work is CPU-bound and the
+        # GIL caps thread scaling, so bulk jobs spill onto processes when
+        # the config opts in.
+        workers = os.cpu_count() or 1
+        chunksize = max(1, len(candidates) // (workers * 4))
+        outcomes = get_search_pool().map(
+            probe, [str(item) for item in candidates], chunksize=chunksize
+        )
+        for file_path, (kind, payload) in zip(candidates, outcomes):
+            if consume(file_path, kind, payload):
                 break
+    else:
+        # Reads release the GIL, so probing files concurrently overlaps the
+        # IO latency; matching stops as soon as max_results is reached.
+        with ThreadPoolExecutor(max_workers=search_worker_count()) as pool:
+            futures = {
+                pool.submit(probe, str(file_path)): file_path
+                for file_path in candidates
+            }
+            try:
+                for future in as_completed(futures):
+                    if consume(futures[future], *future.result()):
+                        break
+            finally:
+                for future in futures:
+                    future.cancel()
+    results.sort(key=lambda item: item["path"])
 
     elapsed_ms = int((time.perf_counter() - start) * 1000)
-    return {
+    report = {
         "results": results,
         "scanned_files": scanned,
         "skipped_binary_files": skipped_binary,
@@ -1086,22 +1769,45 @@ def file_search(
         "warnings": warnings,
         "elapsed_ms": elapsed_ms,
     }
+    with _search_cache_lock:
+        _search_cache[cache_key] = (signature, report)
+        _search_cache.move_to_end(cache_key)
+        while len(_search_cache) > SEARCH_CACHE_MAX:
+            _search_cache.popitem(last=False)
+    return report
+
+
+READ_TEXT_CACHE_MAX_CHARS = 200_000
+
+
+@lru_cache(maxsize=64)
+def _read_text_mtime_cached(path_str: str, mtime_ns: int) -> tuple[str, int]:
+    """Return the first ``READ_TEXT_CACHE_MAX_CHARS`` chars and total length.
+
+    file_read_text never returns more than that many chars, so caching a
+    bounded prefix keeps the cache's worst case at 64 capped entries
+    instead of pinning arbitrarily large files in memory.
+    """
+    content = Path(path_str).read_text(encoding="utf-8")
+    return content[:READ_TEXT_CACHE_MAX_CHARS], len(content)
 
 
 def file_read_text(
-    path: str, max_chars: int, allowed_roots: list[Path]
+    path: str, max_chars: int, allowed_prefixes: tuple[str, ...]
 ) -> dict[str, Any]:
     if not path:
         raise HTTPException(
             status_code=400, detail="file.read_text requires a path input"
         )
     file_path = Path(path).resolve()
-    ensure_file_read_scope(file_path, allowed_roots)
+    ensure_file_read_scope(file_path, allowed_prefixes)
     if not file_path.exists() or not file_path.is_file():
         raise HTTPException(status_code=400, detail=f"File not found: {file_path}")
-    max_chars = max(1, min(max_chars, 200_000))
+    max_chars = max(1, min(max_chars, READ_TEXT_CACHE_MAX_CHARS))
     try:
-        content = file_path.read_text(encoding="utf-8")
+        content, total_chars = _read_text_mtime_cached(
+            str(file_path), file_path.stat().st_mtime_ns
+        )
     except UnicodeDecodeError:
         raise HTTPException(
             status_code=400, detail=f"File is not valid UTF-8 text: {file_path}"
@@ -1110,19 +1816,19 @@ def file_read_text(
         raise HTTPException(
             status_code=400, detail=f"Could not read file {file_path}: {exc}"
         ) from exc
-    truncated = len(content) > max_chars
+    truncated = total_chars > max_chars
     return {
         "path": str(file_path),
         "content": content[:max_chars],
         "truncated": truncated,
-        "returned_chars": min(len(content), max_chars),
-        "total_chars": len(content),
+        "returned_chars": min(total_chars, max_chars),
+        "total_chars": total_chars,
     }
 
 
 def ensure_exec_scope(cwd: Path, plan: Plan) -> None:
-    allowed_roots = get_allowed_read_roots(plan)
-    ensure_file_read_scope(cwd, allowed_roots)
+    allowed_prefixes = get_allowed_read_prefixes(plan)
+    ensure_file_read_scope(cwd, allowed_prefixes)
 
 
 def normalize_shell_inputs(step: Step) -> tuple[list[str], Path, int, int]:
@@ -1154,7 +1860,7 @@ def normalize_shell_inputs(step: Step) -> tuple[list[str], Path, int, int]:
     max_output_chars = int(
         step.inputs.get("max_output_chars", DEFAULT_SHELL_MAX_OUTPUT_CHARS)
     )
-    timeout_ms = max(100, min(timeout_ms, 120_000))
+    timeout_ms = max(1, min(timeout_ms, 120_000))
     max_output_chars = max(256, min(max_output_chars, 200_000))
 
     cwd_input = str(step.inputs.get("cwd", str(Path.cwd())))
@@ -1167,26 +1873,26 @@ def ensure_shell_enabled() -> None:
         raise HTTPException(status_code=403, detail="Shell is disabled in config")
 
 
+_DENY_COMMON = frozenset({"curl", "wget", "ssh"})
+_DENY_WINDOWS = _DENY_COMMON | {
+    "del",
+    "erase",
+    "rmdir",
+    "rd",
+    "format",
+    "diskpart",
+    "powershell",
+    "cmd",
+    "reg",
+    "schtasks",
+}
+_DENY_UNIX = _DENY_COMMON | {"rm", "sudo", "chmod", "chown", "dd", "mkfs", "mount"}
+DENY_KEYWORDS = frozenset(_DENY_WINDOWS if os.name == "nt" else _DENY_UNIX)
+
+
 def enforce_shell_deny_keywords(argv: list[str]) -> None:
-    common = {"curl", "wget", "ssh"}
-    windows_only = {
-        "del",
-        "erase",
-        "rmdir",
-        "rd",
-        "format",
-        "diskpart",
-        "powershell",
-        "cmd",
-        "reg",
-        "schtasks",
-    }
-    unix_only = {"rm", "sudo", "chmod", "chown", "dd", "mkfs", "mount"}
-    deny = set(common)
-    deny.update(windows_only if os.name == "nt" else unix_only)
     for token in argv:
-        normalized = token.lower()
-        if normalized in deny:
+        if token.lower() in DENY_KEYWORDS:
             raise HTTPException(
                 status_code=403, detail=f"Command token denied by policy: {token}"
             )
@@ -1256,7 +1962,8 @@ def execute_internal_shell(
         ensure_exec_scope(target, plan)
         if not target.exists() or not target.is_dir():
             return "", f"ls target not found: {target}\n", 1, False
-        entries = sorted(item.name for item in target.iterdir())
+        with os.scandir(target) as iterator:
+            entries = sorted(entry.name for entry in iterator)
         ensure_not_timed_out()
         return "\n".join(entries) + ("\n" if entries else ""), "", 0, False
 
@@ -1282,20 +1989,45 @@ def execute_internal_shell(
         if target.is_file():
             files = [target]
         elif target.is_dir():
-            files = sorted(target.rglob("*")) if recursive else sorted(target.glob("*"))
-            files = [item for item in files if item.is_file()]
+            if recursive:
+                files = [item for item in target.rglob("*") if item.is_file()]
+            else:
+                with os.scandir(target) as iterator:
+                    files = [
+                        Path(entry.path) for entry in iterator if entry.is_file()
+                    ]
         else:
             return "", f"grep target not found: {target}\n", 1, False
+        pattern_bytes = pattern.encode("utf-8")
+        read_prefixes = get_allowed_read_prefixes(plan)
         for file_path in files:
-            ensure_exec_scope(file_path, plan)
+            ensure_file_read_scope_cached(file_path, read_prefixes)
             ensure_not_timed_out()
             try:
-                lines = file_path.read_text(encoding="utf-8").splitlines()
-            except Exception:
+                data = file_path.read_bytes()
+            except OSError:
                 continue
-            for idx, line in enumerate(lines, start=1):
-                if pattern in line:
-                    matches.append(f"{file_path}:{idx}:{line}")
+            # bytes.find runs the whole buffer in C, so the per-line Python
+            # loop only executes for lines that actually contain the
+            # pattern. Line numbers are tracked by counting newlines between
+            # consecutive hits.
+            line_number = 1
+            counted_to = 0
+            position = 0
+            while (hit := data.find(pattern_bytes, position)) != -1:
+                line_number += data.count(b"\n", counted_to, hit)
+                counted_to = hit
+                line_start = data.rfind(b"\n", 0, hit) + 1
+                line_end = data.find(b"\n", hit)
+                if line_end == -1:
+                    line_end = len(data)
+                try:
+                    text = data[line_start:line_end].decode("utf-8")
+                except UnicodeDecodeError:
+                    break
+                matches.append(f"{file_path}:{line_number}:{text}")
+                position = line_end + 1
+                ensure_not_timed_out()
         return ("\n".join(matches) + ("\n" if matches else "")), "", 0, False
 
     if argv[0] == "find":
@@ -1305,11 +2037,23 @@ def execute_internal_shell(
         if not root.exists() or not root.is_dir():
             return "", f"find root not found: {root}\n", 1, False
         matches: list[str] = []
-        for item in sorted(root.rglob("*")):
+        read_prefixes = get_allowed_read_prefixes(plan)
+        # One compiled regex instead of an fnmatch call per entry, and
+        # os.walk hands back plain names from scandir without building a
+        # Path per entry.
+        name_regex = _segment_regex(pattern)
+        for dirpath, dirnames, filenames in os.walk(root):
             ensure_not_timed_out()
-            if fnmatch(item.name, pattern):
-                ensure_exec_scope(item, plan)
-                matches.append(str(item))
+            for position, name in enumerate(dirnames + filenames):
+                # Re-check the deadline periodically within a directory so
+                # one large flat listing cannot overshoot the timeout.
+                if position % 256 == 255:
+                    ensure_not_timed_out()
+                if name_regex.match(name) is not None:
+                    item_path = os.path.join(dirpath, name)
+                    ensure_file_read_scope_cached(Path(item_path), read_prefixes)
+                    matches.append(item_path)
+        matches.sort()
         return ("\n".join(matches) + ("\n" if matches else "")), "", 0, False
 
     return "", f"Unsupported internal command: {argv[0]}\n", 1, False
@@ -1390,7 +2134,7 @@ def execute_shell_step(step: Step, plan: Plan) -> dict[str, Any]:
 
 @app.get("/v1/health", dependencies=[Depends(require_bearer)])
 def get_health() -> dict[str, Any]:
-    return {"status": "ok", "time": iso(now_utc())}
+    return {"status": "ok", "time": iso_now()}
 
 
 @app.get("/v1/version", dependencies=[Depends(require_bearer)])
@@ -1411,7 +2155,8 @@ def get_models() -> ModelsState:
     response_model=ModelsState,
 )
 def post_models_download(request: ModelDownloadRequest) -> ModelsState:
-    state = get_models_snapshot()
+    global current_models
+    state = current_models.model_copy(deep=True)
     display_name = request.display_name or request.model_id
     local_path: str | None = None
     status: Literal["registered", "download_stubbed"] = "download_stubbed"
@@ -1436,7 +2181,6 @@ def post_models_download(request: ModelDownloadRequest) -> ModelsState:
     if state.default_model_id is None:
         state.default_model_id = request.model_id
     with models_lock:
-        global current_models
         current_models = state
         write_models_state(current_models)
     return get_models_snapshot()
@@ -1448,14 +2192,14 @@ def post_models_download(request: ModelDownloadRequest) -> ModelsState:
     response_model=ModelsState,
 )
 def post_models_set_default(request: ModelSetDefaultRequest) -> ModelsState:
-    state = get_models_snapshot()
+    global current_models
+    state = current_models.model_copy(deep=True)
     if not any(item.model_id == request.model_id for item in state.installed_models):
         raise HTTPException(
             status_code=404, detail=f"Model not installed: {request.model_id}"
         )
     state.default_model_id = request.model_id
     with models_lock:
-        global current_models
         current_models = state
         write_models_state(current_models)
     return get_models_snapshot()
@@ -1475,20 +2219,16 @@ def post_config_reload() -> AppConfig:
     return reload_config()
 
 
-@app.get(
-    "/v1/doctor/report",
-    dependencies=[Depends(require_bearer)],
-    response_model=DoctorReport,
-)
-def get_doctor_report() -> DoctorReport:
-    report = generate_doctor_report()
+@app.get("/v1/doctor/report", dependencies=[Depends(require_bearer)])
+def get_doctor_report() -> ORJSONResponse:
+    report = get_doctor_report_cached()
     append_backend_log("info", f"doctor report generated: {report.overall_status}")
-    return report
+    return model_response(report)
 
 
 @app.get("/v1/doctor/report/export", dependencies=[Depends(require_bearer)])
 def get_doctor_report_export(format: Literal["md", "json"] = "json") -> dict[str, Any]:
-    report = generate_doctor_report()
+    report = get_doctor_report_cached()
     if format == "md":
         return {
             "format": "md",
@@ -1511,29 +2251,36 @@ def get_tasks() -> list[TaskSummary]:
     return load_task_index()
 
 
-@app.get(
-    "/v1/tasks/{task_id}",
-    dependencies=[Depends(require_bearer)],
-    response_model=TaskTrace,
-)
-def get_task(task_id: UUID) -> TaskTrace:
-    return load_task_trace(task_id)
+@app.get("/v1/tasks/{task_id}", dependencies=[Depends(require_bearer)])
+def get_task(task_id: UUID) -> ORJSONResponse:
+    return model_response(load_task_trace(task_id))
 
 
 @app.get("/v1/tasks/{task_id}/export", dependencies=[Depends(require_bearer)])
 def get_task_export(
     task_id: UUID, format: Literal["md", "json"] = "json"
 ) -> dict[str, Any]:
-    trace = load_task_trace(task_id)
     if format == "md":
+        trace = load_task_trace(task_id)
         return {
             "format": "md",
             "content": task_trace_to_markdown(trace),
             "file_name": f"task-{task_id}.md",
         }
+    # The trace on disk is already the JSON we want to hand back; loading
+    # it raw skips the model validate + re-dump round-trip.
+    path = task_trace_path(task_id)
+    if not path.exists():
+        raise HTTPException(status_code=404, detail=f"Task not found: {task_id}")
+    try:
+        content = orjson.loads(path.read_bytes())
+    except orjson.JSONDecodeError as exc:
+        raise HTTPException(
+            status_code=500, detail=f"Invalid task trace JSON: {exc}"
+        ) from exc
     return {
         "format": "json",
-        "content": trace.model_dump(mode="json"),
+        "content": content,
         "file_name": f"task-{task_id}.json",
     }
 
@@ -1544,12 +2291,34 @@ def get_task_export(
     response_model=LogsTailResponse,
 )
 def get_logs_tail(lines: int = 200) -> LogsTailResponse:
+    flush_backend_log()
     path = backend_log_path()
     if not path.exists():
         return LogsTailResponse(lines=[])
-    content = path.read_text(encoding="utf-8", errors="ignore").splitlines()
     take = max(1, min(lines, 2000))
-    return LogsTailResponse(lines=content[-take:])
+    return LogsTailResponse(lines=tail_lines(path, take))
+
+
+def tail_lines(path: Path, take: int) -> list[str]:
+    """Return the last ``take`` lines by reading backwards from EOF.
+
+    Only the tail of the file is read, so the cost scales with the number
+    of requested lines rather than the log size.
+    """
+    with open(path, "rb") as handle:
+        handle.seek(0, os.SEEK_END)
+        remaining = handle.tell()
+        blocks: list[bytes] = []
+        newlines = 0
+        while remaining > 0 and newlines <= take:
+            read_size = min(65536, remaining)
+            remaining -= read_size
+            handle.seek(remaining)
+            block = handle.read(read_size)
+            blocks.append(block)
+            newlines += block.count(b"\n")
+    data = b"".join(reversed(blocks))
+    return data.decode("utf-8", errors="ignore").splitlines()[-take:]
 
 
 @app.get(
@@ -1561,14 +2330,47 @@ def get_logs_search(q: str, limit: int = 200) -> LogsSearchResponse:
     needle = q.lower().strip()
     if not needle:
         return LogsSearchResponse(matches=[])
+    flush_backend_log()
     path = backend_log_path()
     if not path.exists():
         return LogsSearchResponse(matches=[])
+    cap = max(1, min(limit, 5000))
+    needle_bytes = needle.encode("utf-8")
     matches: list[str] = []
-    for line in path.read_text(encoding="utf-8", errors="ignore").splitlines():
-        if needle in line.lower():
-            matches.append(line)
-            if len(matches) >= max(1, min(limit, 5000)):
+    # Scan fixed-size blocks with bytes.lower()/bytes.find so memory stays
+    # O(block) and non-matching regions never cross the Python layer; lines
+    # split across block boundaries are carried into the next block.
+    carry = b""
+    with open(path, "rb") as handle:
+        while len(matches) < cap:
+            block = handle.read(1 << 20)
+            if block:
+                buffer = carry + block
+                cut = buffer.rfind(b"\n")
+                if cut == -1:
+                    carry = buffer
+                    continue
+                carry = buffer[cut + 1 :]
+                buffer = buffer[:cut]
+                final = False
+            else:
+                buffer = carry
+                final = True
+            lowered = buffer.lower()
+            position = 0
+            while (
+                len(matches) < cap
+                and (hit := lowered.find(needle_bytes, position)) != -1
+            ):
+                line_start = buffer.rfind(b"\n", 0, hit) + 1
+                line_end = buffer.find(b"\n", hit)
+                if line_end == -1:
+                    line_end = len(buffer)
+                matches.append(
+                    buffer[line_start:line_end].decode("utf-8", errors="ignore")
+                )
+                position = line_end + 1
+            if final:
                 break
     return LogsSearchResponse(matches=matches)
 
@@ -1579,25 +2381,27 @@ def get_logs_search(q: str, limit: int = 200) -> LogsSearchResponse:
     response_model=LogsExportResponse,
 )
 def post_logs_export(request: LogsExportRequest) -> LogsExportResponse:
+    flush_backend_log()
     path = backend_log_path()
     if not path.exists():
         return LogsExportResponse(format=request.format, content="")
-    lines = path.read_text(encoding="utf-8", errors="ignore").splitlines()
-    redacted = [redact_line(line, request.redact_paths) for line in lines]
+    content = path.read_text(encoding="utf-8", errors="ignore")
+    redacted = redact_text(content, request.redact_paths)
     if request.format == "jsonl":
-        payload = "\n".join(json.dumps({"line": line}) for line in redacted)
+        payload = b"\n".join(
+            orjson.dumps({"line": line}) for line in redacted.splitlines()
+        ).decode("utf-8")
     else:
-        payload = "\n".join(redacted)
+        payload = "\n".join(redacted.splitlines())
     return LogsExportResponse(format=request.format, content=payload)
 
 
-@app.post(
-    "/v1/router/plan", dependencies=[Depends(require_bearer)], response_model=Plan
-)
-def post_router_plan(request: RouterPlanRequest) -> Plan:
+@app.post("/v1/router/plan", dependencies=[Depends(require_bearer)])
+def post_router_plan(request: RouterPlanRequest) -> ORJSONResponse:
     plan = build_plan(request)
     stored_plans[plan.plan_id] = plan
-    return plan
+    _plan_digests[plan.plan_id] = plan_payload_digest(plan.model_dump(mode="json"))
+    return model_response(plan)
 
 
 @app.post(
@@ -1621,31 +2425,71 @@ def post_issue_token(request: IssueTokenRequest) -> ApprovalToken:
     if request.plan_id not in stored_plans:
         raise HTTPException(status_code=404, detail="Plan not found")
     issued_at = now_utc()
+    expires_at = issued_at + timedelta(minutes=5)
     token = ApprovalToken(
         token_id=uuid4(),
         plan_id=request.plan_id,
         issued_at=iso(issued_at),
-        expires_at=iso(issued_at + timedelta(minutes=5)),
+        expires_at=iso(expires_at),
+        expires_at_ms=int(expires_at.timestamp() * 1000),
         ttl_seconds=300,
         one_time_use=True,
     )
-    approval_tokens[token.token_id] = token
+    with approval_lock:
+        prune_approval_tokens(int(issued_at.timestamp() * 1000))
+        approval_tokens[token.token_id] = token
     return token
 
 
-@app.post(
-    "/v1/tasks/execute",
-    dependencies=[Depends(require_bearer)],
-    response_model=TaskTrace,
-)
-def post_tasks_execute(request: ExecuteTaskRequest) -> TaskTrace:
-    stored_plan = stored_plans.get(request.plan.plan_id)
-    plan = stored_plan if stored_plan is not None else request.plan
+def plan_payload_digest(payload: dict[str, Any]) -> bytes:
+    return hashlib.blake2b(
+        orjson.dumps(payload, option=orjson.OPT_SORT_KEYS), digest_size=16
+    ).digest()
+
+
+def resolve_execution_plan(payload: dict[str, Any]) -> Plan:
+    """Turn an execute payload into a Plan, reusing the registered model.
+
+    The issue-token -> execute round-trip sends the same plan twice; when
+    the payload hashes to what was registered for its plan_id, the stored
+    model is reused and the nested Pydantic validation is skipped
+    entirely. Unknown or altered payloads are validated as before, and
+    the registered plan still wins over the incoming copy.
+    """
+    raw_id = payload.get("plan_id")
+    plan_id: UUID | None = None
+    if isinstance(raw_id, str):
+        try:
+            plan_id = UUID(raw_id)
+        except ValueError:
+            plan_id = None
+    if plan_id is not None and plan_id in stored_plans:
+        if _plan_digests.get(plan_id) == plan_payload_digest(payload):
+            stored_plans.move_to_end(plan_id)
+            return stored_plans[plan_id]
+    try:
+        incoming = PLAN_ADAPTER.validate_python(payload)
+    except ValidationError as exc:
+        raise HTTPException(
+            status_code=422, detail=exc.errors(include_url=False, include_context=False)
+        ) from exc
+    stored = stored_plans.get(incoming.plan_id)
+    if stored is not None:
+        _plan_digests[incoming.plan_id] = plan_payload_digest(payload)
+        return stored
+    return incoming
+
+
+@app.post("/v1/tasks/execute", dependencies=[Depends(require_bearer)])
+def post_tasks_execute(request: ExecuteTaskRequest) -> ORJSONResponse:
+    plan = resolve_execution_plan(request.plan)
+    started = now_utc()
     trace = TaskTrace(
         task_id=uuid4(),
         plan_id=plan.plan_id,
         status="running",
-        started_at=iso(now_utc()),
+        started_at=iso(started),
+        started_at_ms=int(started.timestamp() * 1000),
         agent=plan.steps[0].agent if plan.steps else None,
         events=[],
     )
@@ -1658,8 +2502,8 @@ def post_tasks_execute(request: ExecuteTaskRequest) -> TaskTrace:
     token = consume_approval_token(plan, request.approval_token_id, token_required)
     if token is not None:
         trace.events.append(
-            TaskEvent(
-                timestamp=iso(now_utc()),
+            TaskEvent.model_construct(
+                timestamp=iso_now(),
                 level="info",
                 message="Approval token validated",
                 details={"token_id": str(token.token_id)},
@@ -1670,8 +2514,8 @@ def post_tasks_execute(request: ExecuteTaskRequest) -> TaskTrace:
     try:
         for step in plan.steps:
             trace.events.append(
-                TaskEvent(
-                    timestamp=iso(now_utc()),
+                TaskEvent.model_construct(
+                    timestamp=iso_now(),
                     level="info",
                     step_id=step.step_id,
                     message=f"Executing {step.action}",
@@ -1679,7 +2523,7 @@ def post_tasks_execute(request: ExecuteTaskRequest) -> TaskTrace:
                 )
             )
             if step.action == "file.search":
-                allowed_roots = get_allowed_read_roots(plan)
+                allowed_prefixes = get_allowed_read_prefixes(plan)
                 root = str(
                     step.inputs.get("root", step.inputs.get("folder", Path.cwd()))
                 )
@@ -1690,8 +2534,8 @@ def post_tasks_execute(request: ExecuteTaskRequest) -> TaskTrace:
                 )
                 max_snippet_chars = int(step.inputs.get("max_snippet_chars", 240))
                 trace.events.append(
-                    TaskEvent(
-                        timestamp=iso(now_utc()),
+                    TaskEvent.model_construct(
+                        timestamp=iso_now(),
                         level="info",
                         step_id=step.step_id,
                         message="search started",
@@ -1708,11 +2552,11 @@ def post_tasks_execute(request: ExecuteTaskRequest) -> TaskTrace:
                     globs=globs,
                     max_results=max_results,
                     max_snippet_chars=max_snippet_chars,
-                    allowed_roots=allowed_roots,
+                    allowed_prefixes=allowed_prefixes,
                 )
                 trace.events.append(
-                    TaskEvent(
-                        timestamp=iso(now_utc()),
+                    TaskEvent.model_construct(
+                        timestamp=iso_now(),
                         level="info",
                         step_id=step.step_id,
                         message=f"scanned {search_result['scanned_files']} files",
@@ -1729,16 +2573,16 @@ def post_tasks_execute(request: ExecuteTaskRequest) -> TaskTrace:
                 )
                 for warning in search_result["warnings"]:
                     trace.events.append(
-                        TaskEvent(
-                            timestamp=iso(now_utc()),
+                        TaskEvent.model_construct(
+                            timestamp=iso_now(),
                             level="warn",
                             step_id=step.step_id,
                             message=warning,
                         )
                     )
                 trace.events.append(
-                    TaskEvent(
-                        timestamp=iso(now_utc()),
+                    TaskEvent.model_construct(
+                        timestamp=iso_now(),
                         level="info",
                         step_id=step.step_id,
                         message=f"search completed in {search_result['elapsed_ms']} ms",
@@ -1754,15 +2598,15 @@ def post_tasks_execute(request: ExecuteTaskRequest) -> TaskTrace:
                     f"task {trace.task_id} search completed count={len(search_result['results'])} elapsed_ms={search_result['elapsed_ms']}",
                 )
             elif step.action == "file.read_text":
-                allowed_roots = get_allowed_read_roots(plan)
+                allowed_prefixes = get_allowed_read_prefixes(plan)
                 path = str(step.inputs.get("path"))
                 max_chars = int(step.inputs.get("max_chars", 20_000))
                 read_result = file_read_text(
-                    path=path, max_chars=max_chars, allowed_roots=allowed_roots
+                    path=path, max_chars=max_chars, allowed_prefixes=allowed_prefixes
                 )
                 trace.events.append(
-                    TaskEvent(
-                        timestamp=iso(now_utc()),
+                    TaskEvent.model_construct(
+                        timestamp=iso_now(),
                         level="info",
                         step_id=step.step_id,
                         message="file read completed",
@@ -1773,8 +2617,8 @@ def post_tasks_execute(request: ExecuteTaskRequest) -> TaskTrace:
             elif step.action == "conversation.respond":
                 response_text = f"Echo: {step.inputs.get('prompt', '')}"
                 trace.events.append(
-                    TaskEvent(
-                        timestamp=iso(now_utc()),
+                    TaskEvent.model_construct(
+                        timestamp=iso_now(),
                         level="info",
                         step_id=step.step_id,
                         message="Conversation response generated",
@@ -1787,8 +2631,8 @@ def post_tasks_execute(request: ExecuteTaskRequest) -> TaskTrace:
             elif step.action == "shell.exec":
                 shell_result = execute_shell_step(step, plan)
                 trace.events.append(
-                    TaskEvent(
-                        timestamp=iso(now_utc()),
+                    TaskEvent.model_construct(
+                        timestamp=iso_now(),
                         level="info",
                         step_id=step.step_id,
                         message="shell command preview",
@@ -1799,8 +2643,8 @@ def post_tasks_execute(request: ExecuteTaskRequest) -> TaskTrace:
                     )
                 )
                 trace.events.append(
-                    TaskEvent(
-                        timestamp=iso(now_utc()),
+                    TaskEvent.model_construct(
+                        timestamp=iso_now(),
                         level="info",
                         step_id=step.step_id,
                         message="shell command completed",
@@ -1814,8 +2658,8 @@ def post_tasks_execute(request: ExecuteTaskRequest) -> TaskTrace:
                 )
                 if shell_result["truncated"]:
                     trace.events.append(
-                        TaskEvent(
-                            timestamp=iso(now_utc()),
+                        TaskEvent.model_construct(
+                            timestamp=iso_now(),
                             level="warn",
                             step_id=step.step_id,
                             message="shell output truncated",
@@ -1826,32 +2670,32 @@ def post_tasks_execute(request: ExecuteTaskRequest) -> TaskTrace:
                     )
                 if shell_result["timed_out"]:
                     trace.status = "timeout"
-                    trace.ended_at = iso(now_utc())
+                    trace.ended_at = iso_now()
                     persist_task_trace(trace)
                     append_backend_log("warn", f"task {trace.task_id} timed out")
-                    return trace
+                    return model_response(trace)
             else:
                 raise HTTPException(
                     status_code=400, detail=f"Unsupported action: {step.action}"
                 )
         trace.status = "completed"
-        trace.ended_at = iso(now_utc())
+        trace.ended_at = iso_now()
         persist_task_trace(trace)
         append_backend_log("info", f"task {trace.task_id} completed")
-        return trace
+        return model_response(trace)
     except HTTPException:
         trace.status = "failed"
         trace.error = "HTTP exception during execution"
-        trace.ended_at = iso(now_utc())
+        trace.ended_at = iso_now()
         persist_task_trace(trace)
         raise
     except Exception as exc:
         trace.status = "failed"
         trace.error = str(exc)
-        trace.ended_at = iso(now_utc())
+        trace.ended_at = iso_now()
         trace.events.append(
-            TaskEvent(
-                timestamp=iso(now_utc()),
+            TaskEvent.model_construct(
+                timestamp=iso_now(),
                 level="error",
                 message="Execution failed",
                 details={"error": str(exc)},
@@ -1859,7 +2703,7 @@ def post_tasks_execute(request: ExecuteTaskRequest) -> TaskTrace:
         )
         persist_task_trace(trace)
         append_backend_log("error", f"task {trace.task_id} failed: {exc}")
-        return trace
+        return model_response(trace)
 
 
 if __name__ == "__main__":
@@ -1868,4 +2712,23 @@ if __name__ == "__main__":
     reload_config()
     reload_models()
     port = int(os.environ.get("LITECLAW_PORT", "8765"))
-    uvicorn.run("main:app", host="127.0.0.1", port=port, reload=False)
+    workers = int(os.environ.get("LITECLAW_WORKERS", "1"))
+    # uvloop and httptools are markedly faster than the default asyncio
+    # loop and h11 parser; fall back silently where they are unavailable
+    # (e.g. Windows, where uvloop does not build).
+    try:
+        import httptools  # noqa: F401
+        import uvloop  # noqa: F401
+
+        loop, http = "uvloop", "httptools"
+    except ImportError:
+        loop, http = "auto", "auto"
+    uvicorn.run(
+        "main:app",
+        host="127.0.0.1",
+        port=port,
+        reload=False,
+        loop=loop,
+        http=http,
+        workers=workers,
+    )
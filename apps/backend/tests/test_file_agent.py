@@ -1,3 +1,4 @@
+import os
 import time
 from uuid import uuid4
 
@@ -184,11 +185,13 @@ def test_file_search_5000_files_performance(tmp_path) -> None:
     main.current_config = main.AppConfig(allowed_folders=[str(tmp_path.resolve())])
     client = authed()
 
+    root = str(tmp_path)
     for i in range(5000):
         content = f"file {i} - regular content"
         if i % 100 == 0:
             content += " TODO marker"
-        (tmp_path / f"doc_{i}.txt").write_text(content, encoding="utf-8")
+        with open(os.path.join(root, f"doc_{i}.txt"), "w", encoding="utf-8") as handle:
+            handle.write(content)
 
     plan = build_file_search_plan(str(tmp_path), query="TODO", max_results=10)
     main.stored_plans[main.UUID(plan["plan_id"])] = main.Plan(**plan)
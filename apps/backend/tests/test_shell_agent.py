@@ -1,15 +1,63 @@
+import os
 import shutil
 from pathlib import Path
 from uuid import uuid4
 
 import main
+import pytest
 from fastapi.testclient import TestClient
 
 TOKEN = "test-token"
+_OK_STATUSES = frozenset({"completed", "timeout"})
+_HAS_GIT = shutil.which("git") is not None
 
 
-def authed() -> TestClient:
-    return TestClient(main.app, headers={"Authorization": f"Bearer {TOKEN}"})
+@pytest.fixture(autouse=True)
+def _reset_main() -> None:
+    main.API_TOKEN = TOKEN
+    main.approval_tokens.clear()
+    main.stored_plans.clear()
+
+
+@pytest.fixture(scope="session")
+def many_files_dir(tmp_path_factory) -> Path:
+    """A directory tree with 3000 files, built once per session.
+
+    The files exist only to make the internal ``find`` outlast its
+    deadline, so after writing one template the rest are hardlinks —
+    one syscall per file and no extra data blocks.
+    """
+    base = tmp_path_factory.mktemp("many")
+    nested = base / "nested"
+    nested.mkdir()
+    nested_str = str(nested)
+    template = os.path.join(nested_str, "f_0.txt")
+    (nested / "f_0.txt").write_bytes(b"x")
+    for i in range(1, 3000):
+        os.link(template, os.path.join(nested_str, f"f_{i}.txt"))
+    return base
+
+
+@pytest.fixture(scope="module")
+def client():
+    main.API_TOKEN = TOKEN
+    with TestClient(main.app, headers={"Authorization": f"Bearer {TOKEN}"}) as c:
+        yield c
+
+
+# Plan fields that never vary between tests; build_shell_plan copies this
+# and fills in only the per-call pieces.
+_PLAN_TEMPLATE = {
+    "created_at": "2026-02-20T00:00:00Z",
+    "requires_approval": True,
+    "estimated_risk": "medium",
+    "dry_run": False,
+    "router_confidence": 0.95,
+    "router_fallback_used": False,
+    "explain": "Shell execution test",
+}
+_FILE_PERM = {"type": "file", "mode": "read"}
+_SHELL_PERM = {"type": "shell", "mode": "exec"}
 
 
 def build_shell_plan(
@@ -21,36 +69,29 @@ def build_shell_plan(
     plan_roots: list[str] | None = None,
 ) -> dict:
     roots = plan_roots or [cwd]
-    return {
-        "plan_id": str(uuid4()),
-        "created_at": "2026-02-20T00:00:00Z",
-        "user_intent_summary": f"Run {command}",
-        "requires_approval": True,
-        "required_permissions": [
-            {"type": "file", "mode": "read", "targets": roots},
-            {"type": "shell", "mode": "exec", "targets": [command]},
-        ],
-        "steps": [
-            {
-                "step_id": "s1",
-                "agent": "shell",
-                "action": "shell.exec",
-                "inputs": {
-                    "command": command,
-                    "cwd": cwd,
-                    "timeout_ms": timeout_ms,
-                    "max_output_chars": max_output_chars,
-                },
-                "side_effects": "exec",
-                "preview": f"Run {command}",
-            }
-        ],
-        "estimated_risk": "medium",
-        "dry_run": False,
-        "router_confidence": 0.95,
-        "router_fallback_used": False,
-        "explain": "Shell execution test",
-    }
+    plan = _PLAN_TEMPLATE.copy()
+    plan["plan_id"] = str(uuid4())
+    plan["user_intent_summary"] = f"Run {command}"
+    plan["required_permissions"] = [
+        {**_FILE_PERM, "targets": roots},
+        {**_SHELL_PERM, "targets": [command]},
+    ]
+    plan["steps"] = [
+        {
+            "step_id": "s1",
+            "agent": "shell",
+            "action": "shell.exec",
+            "inputs": {
+                "command": command,
+                "cwd": cwd,
+                "timeout_ms": timeout_ms,
+                "max_output_chars": max_output_chars,
+            },
+            "side_effects": "exec",
+            "preview": f"Run {command}",
+        }
+    ]
+    return plan
 
 
 def issue_token(client: TestClient, plan_id: str) -> str:
@@ -66,6 +107,24 @@ def execute(client: TestClient, plan: dict, token: str | None) -> TestClient:
     return client.post("/v1/tasks/execute", json=payload)
 
 
+def execute_direct(plan: dict, token: str | None) -> int:
+    """Invoke the execute handler in-process and return the status code.
+
+    Skips the ASGI routing and both JSON passes for tests that only
+    assert on a permission failure; tests that inspect the trace body
+    keep the HTTP path.
+    """
+    request = main.ExecuteTaskRequest(
+        plan=plan,
+        approval_token_id=main.UUID(token) if token else None,
+    )
+    try:
+        main.post_tasks_execute(request)
+    except main.HTTPException as exc:
+        return exc.status_code
+    return 200
+
+
 def configure(tmp_path, shell_enabled: bool = True) -> None:
     main.current_config = main.AppConfig(
         allowed_folders=[str(tmp_path.resolve())],
@@ -77,37 +136,41 @@ def register_plan(plan: dict) -> None:
     main.stored_plans[main.UUID(plan["plan_id"])] = main.Plan(**plan)
 
 
+def prime_approval(plan: dict) -> str:
+    """Register the plan and mint its approval token in-process.
+
+    Skips the HTTP issuance round-trip for tests that exercise execute
+    behaviour rather than the issue path, which keeps its own coverage.
+    """
+    register_plan(plan)
+    now = main.now_utc()
+    token = main.ApprovalToken(
+        token_id=uuid4(),
+        plan_id=main.UUID(plan["plan_id"]),
+        issued_at=main.iso(now),
+        expires_at=main.iso(now + main.timedelta(seconds=300)),
+        expires_at_ms=int(now.timestamp() * 1000) + 300_000,
+    )
+    main.approval_tokens[token.token_id] = token
+    return str(token.token_id)
+
+
 def test_shell_disabled_returns_403(tmp_path) -> None:
-    main.API_TOKEN = TOKEN
-    main.approval_tokens.clear()
-    main.stored_plans.clear()
     configure(tmp_path, shell_enabled=False)
-    client = authed()
     plan = build_shell_plan("pwd", str(tmp_path))
-    register_plan(plan)
-    token = issue_token(client, plan["plan_id"])
-    response = execute(client, plan, token)
-    assert response.status_code == 403
+    token = prime_approval(plan)
+    assert execute_direct(plan, token) == 403
 
 
 def test_shell_missing_token_returns_403(tmp_path) -> None:
-    main.API_TOKEN = TOKEN
-    main.approval_tokens.clear()
-    main.stored_plans.clear()
     configure(tmp_path, shell_enabled=True)
-    client = authed()
     plan = build_shell_plan("pwd", str(tmp_path))
     register_plan(plan)
-    response = execute(client, plan, None)
-    assert response.status_code == 403
+    assert execute_direct(plan, None) == 403
 
 
-def test_shell_token_reuse_returns_403(tmp_path) -> None:
-    main.API_TOKEN = TOKEN
-    main.approval_tokens.clear()
-    main.stored_plans.clear()
+def test_shell_token_reuse_returns_403(client, tmp_path) -> None:
     configure(tmp_path, shell_enabled=True)
-    client = authed()
     plan = build_shell_plan("pwd", str(tmp_path))
     register_plan(plan)
     token = issue_token(client, plan["plan_id"])
@@ -118,28 +181,18 @@ def test_shell_token_reuse_returns_403(tmp_path) -> None:
 
 
 def test_shell_cwd_scope_enforced(tmp_path) -> None:
-    main.API_TOKEN = TOKEN
-    main.approval_tokens.clear()
-    main.stored_plans.clear()
     allowed = tmp_path / "allowed"
     allowed.mkdir()
     outside = tmp_path / "outside"
     outside.mkdir()
     configure(allowed, shell_enabled=True)
-    client = authed()
     plan = build_shell_plan("pwd", str(outside), plan_roots=[str(allowed)])
-    register_plan(plan)
-    token = issue_token(client, plan["plan_id"])
-    response = execute(client, plan, token)
-    assert response.status_code == 403
+    token = prime_approval(plan)
+    assert execute_direct(plan, token) == 403
 
 
-def test_shell_allowlist_and_deny_patterns(tmp_path) -> None:
-    main.API_TOKEN = TOKEN
-    main.approval_tokens.clear()
-    main.stored_plans.clear()
+def test_shell_allowlist_accepts_safe_commands(client, tmp_path) -> None:
     configure(tmp_path, shell_enabled=True)
-    client = authed()
 
     allowed_plan = build_shell_plan("python --version", str(tmp_path))
     register_plan(allowed_plan)
@@ -147,68 +200,58 @@ def test_shell_allowlist_and_deny_patterns(tmp_path) -> None:
     allowed_resp = execute(client, allowed_plan, token)
     assert allowed_resp.status_code == 200
 
-    if shutil.which("git"):
+    if _HAS_GIT:
         git_plan = build_shell_plan("git status", str(tmp_path))
         register_plan(git_plan)
         token = issue_token(client, git_plan["plan_id"])
         git_resp = execute(client, git_plan, token)
         assert git_resp.status_code == 200
 
-    denied = [
+
+@pytest.mark.parametrize(
+    "cmd",
+    [
         "git commit",
         "python -m pip install requests",
         "whoami",
         "ls && whoami",
         "ls | grep x",
         "ls > out.txt",
-    ]
-    for cmd in denied:
-        plan = build_shell_plan(cmd, str(tmp_path))
-        register_plan(plan)
-        token = issue_token(client, plan["plan_id"])
-        response = execute(client, plan, token)
-        assert response.status_code == 403, f"expected deny for: {cmd}"
-
-
-def test_internal_commands_work(tmp_path) -> None:
-    main.API_TOKEN = TOKEN
-    main.approval_tokens.clear()
-    main.stored_plans.clear()
+    ],
+)
+def test_shell_denied_commands(client, tmp_path, cmd) -> None:
     configure(tmp_path, shell_enabled=True)
-    sample = tmp_path / "sample.txt"
-    sample.write_text("hello\nTODO line\n", encoding="utf-8")
-    client = authed()
+    plan = build_shell_plan(cmd, str(tmp_path))
+    token = prime_approval(plan)
+    response = execute(client, plan, token)
+    assert response.status_code == 403, f"expected deny for: {cmd}"
 
-    commands = [
+
+@pytest.mark.parametrize(
+    "cmd",
+    [
         "pwd",
         "ls",
-        f"cat {sample.name}",
-        f"grep TODO {sample.name}",
-        f"find . *.txt",
-    ]
-    for cmd in commands:
-        plan = build_shell_plan(cmd, str(tmp_path))
-        register_plan(plan)
-        token = issue_token(client, plan["plan_id"])
-        response = execute(client, plan, token)
-        assert response.status_code == 200, (
-            f"unexpected status for {cmd}: {response.text}"
-        )
-        trace = response.json()
-        assert trace["status"] in {"completed", "timeout"}
-
-
-def test_shell_timeout_enforced(tmp_path) -> None:
-    main.API_TOKEN = TOKEN
-    main.approval_tokens.clear()
-    main.stored_plans.clear()
+        "cat sample.txt",
+        "grep TODO sample.txt",
+        "find . *.txt",
+    ],
+)
+def test_internal_commands_work(client, tmp_path, cmd) -> None:
     configure(tmp_path, shell_enabled=True)
-    nested = tmp_path / "nested"
-    nested.mkdir()
-    for i in range(3000):
-        (nested / f"f_{i}.txt").write_text("x", encoding="utf-8")
-    client = authed()
-    plan = build_shell_plan("find . *.txt", str(tmp_path), timeout_ms=1)
+    (tmp_path / "sample.txt").write_bytes(b"hello\nTODO line\n")
+    plan = build_shell_plan(cmd, str(tmp_path))
+    token = prime_approval(plan)
+    response = execute(client, plan, token)
+    assert response.status_code == 200, (
+        f"unexpected status for {cmd}: {response.text}"
+    )
+    assert response.json()["status"] in _OK_STATUSES
+
+
+def test_shell_timeout_enforced(client, many_files_dir) -> None:
+    configure(many_files_dir, shell_enabled=True)
+    plan = build_shell_plan("find . *.txt", str(many_files_dir), timeout_ms=1)
     register_plan(plan)
     token = issue_token(client, plan["plan_id"])
     response = execute(client, plan, token)
@@ -216,23 +259,16 @@ def test_shell_timeout_enforced(tmp_path) -> None:
     assert response.json()["status"] == "timeout"
 
 
-def test_shell_output_truncation(tmp_path) -> None:
-    main.API_TOKEN = TOKEN
-    main.approval_tokens.clear()
-    main.stored_plans.clear()
+def test_shell_output_truncation(client, tmp_path) -> None:
     configure(tmp_path, shell_enabled=True)
     large = tmp_path / "large.txt"
-    large.write_text("A" * 5000, encoding="utf-8")
-    client = authed()
+    large.write_bytes(b"A" * 5000)
     plan = build_shell_plan(f"cat {large.name}", str(tmp_path), max_output_chars=200)
     register_plan(plan)
     token = issue_token(client, plan["plan_id"])
     response = execute(client, plan, token)
     assert response.status_code == 200
     trace = response.json()
-    warn_events = [
-        event
-        for event in trace["events"]
-        if event["message"] == "shell output truncated"
-    ]
-    assert warn_events, "expected truncation warning event"
+    assert any(
+        event["message"] == "shell output truncated" for event in trace["events"]
+    ), "expected truncation warning event"